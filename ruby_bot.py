@@ -1,15 +1,22 @@
+import time
+BOOT_STARTED = time.perf_counter()  # Startup profile: measured from the very first import
+
 import os
 import discord
-from discord.ext import commands
-from supabase import create_client, Client
+from discord.ext import commands, tasks
 from dotenv import load_dotenv
-from groq import Groq
 import random
-import time
 import re
 import traceback
 import base64
 import requests
+import asyncio
+import json
+import io
+import tempfile
+import threading
+import datetime
+import stats_io
 
 # --- CONFIG ---
 load_dotenv()
@@ -21,42 +28,107 @@ MEMORY_LIMIT = 20
 AMBIENT_CHANCE = 0.20
 AMBIENT_COOLDOWN = 600  # 10 minutes in seconds
 AMBIENT_ACTIVE = True # Default On
+# Batched emotion analysis: in a busy channel a due reply waits up to this long so several users share one call
+EMOTION_BATCH_WINDOW = float(os.getenv("EMOTION_BATCH_WINDOW", "3"))  # seconds (0 = analyze one by one, no wait)
+EMOTION_BATCH_QUIET = 30  # seconds without other due users after which a channel counts as quiet (no wait)
+PROGRESS_EDIT_INTERVAL = 2  # seconds between progress message edits for !export_stats / !import_stats
+MAINTENANCE_ACTIVE = os.getenv("MAINTENANCE_ACTIVE", "true").lower() != "false" # Disable on extra instances if you like
+MAINTENANCE_INTERVAL = 10  # minutes between jealousy decay / role refresh / leaderboard cache runs
+JEALOUSY_DECAY = 2  # jealousy points that fade per maintenance run
+LOW_MEMORY = os.getenv("LOW_MEMORY", "false").lower() == "true" # Minimal intents + caches for big guilds / many shards
+MEMORY_REPORT_INTERVAL = 30  # minutes between steady-state memory reports
 
 # --- VALIDATE CONFIG ---
 REQUIRED_VARS = ["SUPABASE_URL", "SUPABASE_KEY", "GROQ_API_KEY", "DISCORD_TOKEN"]
-missing = [v for v in REQUIRED_VARS if not os.getenv(v)]
-if missing:
-    raise ValueError(f"CRITICAL: Missing environment variables: {', '.join(missing)}. Please add them to your hosting provider's Variables tab!")
+
+def validate_config():
+    missing = [v for v in REQUIRED_VARS if not os.getenv(v)]
+    if missing:
+        raise ValueError(f"CRITICAL: Missing environment variables: {', '.join(missing)}. Please add them to your hosting provider's Variables tab!")
 
 # --- INIT ---
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-groq_client = Groq(api_key=GROQ_API_KEY)
+# Clients (and their SDK imports) are created on first use so the gateway can connect sooner
+# Also called from asyncio.to_thread workers, hence the lock (one client each, never two)
+_supabase = None
+_groq_client = None
+_client_lock = threading.Lock()
 
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+def get_supabase():
+    global _supabase
+    if _supabase is None:
+        with _client_lock:
+            if _supabase is None:
+                from supabase import create_client
+                _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase
+
+def get_groq():
+    global _groq_client
+    if _groq_client is None:
+        with _client_lock:
+            if _groq_client is None:
+                from groq import Groq
+                _groq_client = Groq(api_key=GROQ_API_KEY)
+    return _groq_client
+
+if LOW_MEMORY:
+    # Only what Ruby actually uses: guilds (channels/roles for permission checks), messages and their text.
+    # Mentions and authors arrive inside the message payload, so no member list is needed.
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = True
+    intents.dm_messages = True
+    intents.message_content = True
+    bot = commands.Bot(
+        command_prefix="!",
+        intents=intents,
+        max_messages=MEMORY_LIMIT,  # history is fetched from the API anyway
+        member_cache_flags=discord.MemberCacheFlags.none(),
+        chunk_guilds_at_startup=False
+    )
+else:
+    intents = discord.Intents.default()
+    intents.message_content = True
+    bot = commands.Bot(command_prefix="!", intents=intents)
+
+STARTUP_REPORTED = False
 
 # Track last ambient response per channel
 last_ambient_response = {}
 
+# Answers when nobody fits a leaderboard stat (also the order of get_leaderboard keys)
+LEADERBOARD_FALLBACKS = {
+    "favorite": "No one yet...",
+    "high_affinity": "No one",
+    "low_affinity": "No one",
+    "high_trust": "No one",
+    "low_trust": "No one",
+    "high_jealousy": "No one",
+    "never_jealous": "Everyone makes me jealous!",
+    "most_insults": "No one",
+    "never_insulted": "Everyone is mean!",
+    "most_compliments": "No one",
+    "never_complimented": "Everyone is nice!"
+}
+
 # --- MEMORY MANAGER ---
 class RubyMemory:
     def get_user_data(self, discord_id, username, display_name):
         """Fetches User + Relationship + Personality"""
         is_new_user = False
-        res = supabase.table('users').select('id').eq('discord_id', str(discord_id)).execute()
+        res = get_supabase().table('users').select('id').eq('discord_id', str(discord_id)).execute()
         if not res.data:
-            user = supabase.table('users').insert({"discord_id": str(discord_id), "username": username}).execute()
+            user = get_supabase().table('users').insert({"discord_id": str(discord_id), "username": username}).execute()
             uuid = user.data[0]['id']
             # Init Defaults
-            supabase.table('relationships').insert({"user_uuid": uuid, "role": "neutral"}).execute()
-            supabase.table('personalities').insert({"user_uuid": uuid}).execute()
+            get_supabase().table('relationships').insert({"user_uuid": uuid, "role": "neutral"}).execute()
+            get_supabase().table('personalities').insert({"user_uuid": uuid}).execute()
             is_new_user = True
         else:
             uuid = res.data[0]['id']
 
-        rel = supabase.table('relationships').select('*').eq('user_uuid', uuid).execute()
-        pers = supabase.table('personalities').select('*').eq('user_uuid', uuid).execute()
+        rel = get_supabase().table('relationships').select('*').eq('user_uuid', uuid).execute()
+        pers = get_supabase().table('personalities').select('*').eq('user_uuid', uuid).execute()
         
         db_nick = pers.data[0]['nickname_preference'] if pers.data else None
         final_name = db_nick if db_nick else display_name
@@ -73,82 +145,98 @@ class RubyMemory:
 
     def has_history(self, user_uuid):
         """Checks if user has any previous messages logged"""
-        res = supabase.table('convos').select('id').eq('user_uuid', user_uuid).limit(1).execute()
+        res = get_supabase().table('convos').select('id').eq('user_uuid', user_uuid).limit(1).execute()
         return len(res.data) > 0
 
     def log_chat(self, user_uuid, role, content):
-        supabase.table('convos').insert({"user_uuid": user_uuid, "role": role, "content": content}).execute()
+        get_supabase().table('convos').insert({"user_uuid": user_uuid, "role": role, "content": content}).execute()
     
     def set_nickname(self, user_uuid, new_name):
-        supabase.table('personalities').update({"nickname_preference": new_name}).eq('user_uuid', user_uuid).execute()
+        get_supabase().table('personalities').update({"nickname_preference": new_name}).eq('user_uuid', user_uuid).execute()
 
     def get_recent_history(self, user_uuid, limit=10):
-        res = supabase.table('convos').select('*').eq('user_uuid', user_uuid).order('created_at', desc=True).limit(limit).execute()
+        res = get_supabase().table('convos').select('*').eq('user_uuid', user_uuid).order('created_at', desc=True).limit(limit).execute()
         return res.data[::-1] if res.data else []
 
     def get_message_count(self, user_uuid):
-        res = supabase.table('convos').select('*', count='exact').eq('user_uuid', user_uuid).execute()
+        res = get_supabase().table('convos').select('*', count='exact').eq('user_uuid', user_uuid).execute()
         return res.count
 
     def get_last_seen(self, user_uuid):
         """Returns the timestamp of the last message from this user (or None)"""
-        res = supabase.table('convos').select('created_at').eq('user_uuid', user_uuid).eq('role', 'user').order('created_at', desc=True).limit(1).execute()
+        res = get_supabase().table('convos').select('created_at').eq('user_uuid', user_uuid).eq('role', 'user').order('created_at', desc=True).limit(1).execute()
         if res.data:
             return res.data[0]['created_at']
         return None
 
+    def get_cached_leaderboard(self):
+        """Leaderboard precomputed by run_maintenance() (one query). None if missing or stale."""
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=MAINTENANCE_INTERVAL * 3)
+        res = get_supabase().table('leaderboard_cache').select('stat, username').gte('refreshed_at', cutoff.isoformat()).execute()
+        if not res.data:
+            return None
+        names = {row['stat']: row['username'] for row in res.data}
+        return {stat: names.get(stat) or fallback for stat, fallback in LEADERBOARD_FALLBACKS.items()}
+
     def get_leaderboard(self):
+        try:
+            cached = self.get_cached_leaderboard()
+            if cached:
+                return cached
+        except Exception as e:
+            print(f"Leaderboard Cache Error: {e}")
+
         stats = {}
         try:
             # Helper to get name from user_uuid
             def get_name(u_uuid):
                 if not u_uuid: return "None"
-                r = supabase.table('users').select('username').eq('id', u_uuid).single().execute()
+                r = get_supabase().table('users').select('username').eq('id', u_uuid).single().execute()
                 return r.data['username'] if r.data else "Unknown"
 
             # 1. Favorite (Baby > Favorite)
             # Check for 'baby' first ( Supreme Role )
-            baby = supabase.table('relationships').select('user_uuid').eq('role', 'baby').limit(1).execute()
+            baby = get_supabase().table('relationships').select('user_uuid').eq('role', 'baby').limit(1).execute()
             if baby.data:
                  stats['favorite'] = get_name(baby.data[0]['user_uuid'])
             else:
                  # Fallback to normal favorite
-                 fav = supabase.table('relationships').select('user_uuid').eq('role', 'favorite').limit(1).execute()
+                 fav = get_supabase().table('relationships').select('user_uuid').eq('role', 'favorite').limit(1).execute()
                  stats['favorite'] = get_name(fav.data[0]['user_uuid']) if fav.data else "No one yet..."
 
             # 2. Affinity (High/Low)
-            high_aff = supabase.table('relationships').select('user_uuid').order('affinity_score', desc=True).limit(1).execute()
+            high_aff = get_supabase().table('relationships').select('user_uuid').order('affinity_score', desc=True).limit(1).execute()
             stats['high_affinity'] = get_name(high_aff.data[0]['user_uuid']) if high_aff.data else "No one"
             
-            low_aff = supabase.table('relationships').select('user_uuid').order('affinity_score', desc=False).limit(1).execute()
+            low_aff = get_supabase().table('relationships').select('user_uuid').order('affinity_score', desc=False).limit(1).execute()
             stats['low_affinity'] = get_name(low_aff.data[0]['user_uuid']) if low_aff.data else "No one"
 
             # 3. Trust (High/Low)
-            high_trust = supabase.table('relationships').select('user_uuid').order('trust_score', desc=True).limit(1).execute()
+            high_trust = get_supabase().table('relationships').select('user_uuid').order('trust_score', desc=True).limit(1).execute()
             stats['high_trust'] = get_name(high_trust.data[0]['user_uuid']) if high_trust.data else "No one"
             
-            low_trust = supabase.table('relationships').select('user_uuid').order('trust_score', desc=False).limit(1).execute()
+            low_trust = get_supabase().table('relationships').select('user_uuid').order('trust_score', desc=False).limit(1).execute()
             stats['low_trust'] = get_name(low_trust.data[0]['user_uuid']) if low_trust.data else "No one"
 
             # 4. Jealousy (High/Never)
-            high_jeal = supabase.table('relationships').select('user_uuid').order('jealousy_meter', desc=True).limit(1).execute()
+            high_jeal = get_supabase().table('relationships').select('user_uuid').order('jealousy_meter', desc=True).limit(1).execute()
             stats['high_jealousy'] = get_name(high_jeal.data[0]['user_uuid']) if high_jeal.data else "No one"
 
-            zero_jeal = supabase.table('relationships').select('user_uuid').eq('jealousy_meter', 0).execute()
+            zero_jeal = get_supabase().table('relationships').select('user_uuid').eq('jealousy_meter', 0).execute()
             stats['never_jealous'] = get_name(random.choice(zero_jeal.data)['user_uuid']) if zero_jeal.data else "Everyone makes me jealous!"
 
             # 5. Insults (Most/Never)
-            most_ins = supabase.table('relationships').select('user_uuid').order('insults_count', desc=True).limit(1).execute()
+            most_ins = get_supabase().table('relationships').select('user_uuid').order('insults_count', desc=True).limit(1).execute()
             stats['most_insults'] = get_name(most_ins.data[0]['user_uuid']) if most_ins.data else "No one"
 
-            zero_ins = supabase.table('relationships').select('user_uuid').eq('insults_count', 0).execute()
+            zero_ins = get_supabase().table('relationships').select('user_uuid').eq('insults_count', 0).execute()
             stats['never_insulted'] = get_name(random.choice(zero_ins.data)['user_uuid']) if zero_ins.data else "Everyone is mean!"
 
             # 6. Compliments (Most/Never)
-            most_comp = supabase.table('relationships').select('user_uuid').order('compliments_count', desc=True).limit(1).execute()
+            most_comp = get_supabase().table('relationships').select('user_uuid').order('compliments_count', desc=True).limit(1).execute()
             stats['most_compliments'] = get_name(most_comp.data[0]['user_uuid']) if most_comp.data else "No one"
 
-            zero_comp = supabase.table('relationships').select('user_uuid').eq('compliments_count', 0).execute()
+            zero_comp = get_supabase().table('relationships').select('user_uuid').eq('compliments_count', 0).execute()
             stats['never_complimented'] = get_name(random.choice(zero_comp.data)['user_uuid']) if zero_comp.data else "Everyone is nice!"
             
             return stats
@@ -205,46 +293,208 @@ async def analyze_emotions(history_text, speaker_data):
         {history_text}
         """
         
-        chat_completion = groq_client.chat.completions.create(
+        chat_completion = get_groq().chat.completions.create(
             messages=[{"role": "system", "content": prompt}],
             model="llama-3.1-8b-instant",
             response_format={"type": "json_object"}
         )
         
         result = chat_completion.choices[0].message.content
-        import json
         data = json.loads(result)
         
-        # Calculate new totals
-        new_affinity = max(-100, min(100, current_rel['affinity_score'] + data.get('affinity_change', 0)))
-        new_trust = max(0, min(100, current_rel['trust_score'] + data.get('trust_change', 0)))
-        new_jealousy = max(0, min(100, current_rel['jealousy_meter'] + data.get('jealousy_change', 0)))
-        
-        new_insults = current_rel['insults_count'] + data.get('insults_count', 0)
-        new_compliments = current_rel['compliments_count'] + data.get('compliments_count', 0)
-        new_vibe = data.get('vibe_summary', "Neutral")
+        rel_row, new_vibe = apply_emotion_deltas(current_rel, data)
 
         # Update DB - Relationships
-        supabase.table('relationships').update({
-            "affinity_score": new_affinity,
-            "trust_score": new_trust,
-            "jealousy_meter": new_jealousy,
-            "insults_count": new_insults,
-            "compliments_count": new_compliments
-        }).eq('user_uuid', speaker_data['uuid']).execute()
+        get_supabase().table('relationships').update(rel_row).eq('user_uuid', speaker_data['uuid']).execute()
 
         # Update DB - Personalities (Vibe)
-        supabase.table('personalities').update({
+        get_supabase().table('personalities').update({
             "vibe_summary": new_vibe
         }).eq('user_uuid', speaker_data['uuid']).execute()
         
-        print(f"DEBUG: Updated {speaker_data['nickname']} -> Aff:{new_affinity} Tru:{new_trust} Jeal:{new_jealousy} Ins:{new_insults} Comp:{new_compliments} Vibe:{new_vibe}")
+        print(f"DEBUG: Updated {speaker_data['nickname']} -> Aff:{rel_row['affinity_score']} Tru:{rel_row['trust_score']} Jeal:{rel_row['jealousy_meter']} Ins:{rel_row['insults_count']} Comp:{rel_row['compliments_count']} Vibe:{new_vibe}")
         return True
 
     except Exception as e:
         print(f"ERROR in analyze_emotions: {e}")
         return False
 
+def _as_int(value):
+    """Model output is not trusted: anything that isn't a number counts as 0"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+def apply_emotion_deltas(current_rel, data):
+    """Turns one analysis result into new relationship totals + vibe"""
+    new_vibe = data.get('vibe_summary') or "Neutral"
+    rel_row = {
+        "affinity_score": max(-100, min(100, current_rel['affinity_score'] + _as_int(data.get('affinity_change', 0)))),
+        "trust_score": max(0, min(100, current_rel['trust_score'] + _as_int(data.get('trust_change', 0)))),
+        "jealousy_meter": max(0, min(100, current_rel['jealousy_meter'] + _as_int(data.get('jealousy_change', 0)))),
+        "insults_count": current_rel['insults_count'] + max(0, _as_int(data.get('insults_count', 0))),
+        "compliments_count": current_rel['compliments_count'] + max(0, _as_int(data.get('compliments_count', 0)))
+    }
+    return rel_row, str(new_vibe)[:100]
+
+async def analyze_emotions_batch(history_text, entries):
+    """
+    One analysis call for several users of the same channel.
+    entries: {user_uuid: {"speaker": speaker_data, "line": "Name: latest message"}}
+    Returns the set of user_uuids that were updated.
+    """
+    try:
+        print(f"DEBUG: Batch analyzing emotions for {', '.join(e['speaker']['nickname'] for e in entries.values())}...")
+        # Short per-batch keys: the small model copies "1".."N" back far more reliably than UUIDs
+        keys = {}
+        user_lines = []
+        for index, (uuid, entry) in enumerate(entries.items(), start=1):
+            keys[str(index)] = uuid
+            rel = entry['speaker']['rel']
+            user_lines.append(
+                f"- id: {index} | name: {entry['speaker']['nickname']} | role: {rel['role']} | "
+                f"affinity: {rel['affinity_score']} | trust: {rel['trust_score']} | jealousy: {rel['jealousy_meter']}"
+            )
+        new_lines = "\n".join(entry['line'] for entry in entries.values())
+        users_block = "\n".join(user_lines)
+
+        prompt = f"""
+        Analyze the recent conversation history between several Users and Ruby.
+        For EACH listed User, determine how their tone should impact Ruby's emotional stats.
+        
+        Users:
+        {users_block}
+        
+        Rules:
+        1. Return ONLY a JSON object: {{"users": [ ... ]}} with one entry per listed User.
+           Entry keys: "id" (the User's number from the list), "affinity_change", "trust_change", "jealousy_change", "insults_count", "compliments_count", "vibe_summary".
+        2. Affinity/Trust: Small integers (+/- 1 to 5). Nice=+, Rude=-.
+        3. Jealousy: 
+           - Increase (+2 to +5) IF that User talks about other girls/bots AND their Role is "favorite" or "baby".
+           - Otherwise, keep change 0 or very small.
+        4. Insults/Compliments: Count explicit ones from that User in this chunk (formatted as integer, e.g. 0 or 1).
+        5. Vibe Summary: A very short (3-5 words) description of that User's current vibe based on this chunk.
+        6. Only judge a User by their OWN messages.
+        
+        History:
+        {history_text}
+        {new_lines}
+        """
+
+        chat_completion = get_groq().chat.completions.create(
+            messages=[{"role": "system", "content": prompt}],
+            model="llama-3.1-8b-instant",
+            response_format={"type": "json_object"}
+        )
+
+        data = json.loads(chat_completion.choices[0].message.content)
+        results = data.get('users') if isinstance(data, dict) else None
+        if not isinstance(results, list):
+            print("ERROR in analyze_emotions_batch: response has no 'users' array")
+            return set()
+
+        rel_rows = []
+        pers_rows = []
+        for item in results:
+            if not isinstance(item, dict): continue
+            key = str(item.get('id', '')).strip()
+            uuid = keys.get(key)
+            if not uuid:
+                print(f"WARNING in analyze_emotions_batch: unknown id {key!r} in response, ignoring it")
+                continue
+            # Skip duplicates and rows we can't upsert by primary key
+            if any(r['user_uuid'] == uuid for r in rel_rows): continue
+            speaker = entries[uuid]['speaker']
+            if 'id' not in speaker['rel'] or 'id' not in speaker['pers']: continue
+
+            rel_row, new_vibe = apply_emotion_deltas(speaker['rel'], item)
+            rel_rows.append({"id": speaker['rel']['id'], "user_uuid": uuid, **rel_row})
+            pers_rows.append({"id": speaker['pers']['id'], "user_uuid": uuid, "vibe_summary": new_vibe})
+            print(f"DEBUG: Updated {speaker['nickname']} -> Aff:{rel_row['affinity_score']} Tru:{rel_row['trust_score']} Jeal:{rel_row['jealousy_meter']} Ins:{rel_row['insults_count']} Comp:{rel_row['compliments_count']} Vibe:{new_vibe}")
+
+        missing = [entries[uuid]['speaker']['nickname'] for uuid in entries if uuid not in {r['user_uuid'] for r in rel_rows}]
+        if missing:
+            print(f"WARNING in analyze_emotions_batch: no usable result for {', '.join(missing)}")
+
+        if rel_rows:
+            # Bulk write: one upsert per table for the whole batch
+            get_supabase().table('relationships').upsert(rel_rows).execute()
+            get_supabase().table('personalities').upsert(pers_rows).execute()
+        return {r['user_uuid'] for r in rel_rows}
+
+    except Exception as e:
+        print(f"ERROR in analyze_emotions_batch: {e}")
+        return set()
+
+class EmotionBatcher:
+    """
+    Collects users that are due for analysis per channel and analyzes them together
+    once EMOTION_BATCH_WINDOW seconds have passed since the first one arrived.
+    Quiet channels (no other due user within EMOTION_BATCH_QUIET seconds) are analyzed right away.
+    """
+    def __init__(self, window, quiet):
+        self.window = window
+        self.quiet = quiet
+        self.pending = {}  # channel_id -> {user_uuid: {"speaker", "line", "futures"}}
+        self.history = {}  # channel_id -> latest history_text
+        self.last_due = {}  # channel_id -> (time, user_uuid) of the latest due user
+        self.tasks = set()  # running flush tasks (asyncio only keeps weak references)
+
+    async def submit(self, channel_id, history_text, line, speaker_data):
+        """Queues a user and waits until their batch has been analyzed. Returns True on success."""
+        now = time.time()
+        last_time, last_uuid = self.last_due.get(channel_id, (0, None))
+        self.last_due[channel_id] = (now, speaker_data['uuid'])
+        busy = last_uuid != speaker_data['uuid'] and now - last_time < self.quiet
+
+        if self.window <= 0 or (channel_id not in self.pending and not busy):
+            return await analyze_emotions(history_text + f"\n{line}", speaker_data)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self.pending.get(channel_id)
+        if batch is None:
+            batch = self.pending[channel_id] = {}
+            loop.call_later(self.window, self.start_flush, channel_id)
+
+        # Same user twice in one window: keep the newest message, answer both waiters
+        entry = batch.setdefault(speaker_data['uuid'], {"futures": []})
+        entry['speaker'] = speaker_data
+        entry['line'] = line
+        entry['futures'].append(future)
+        self.history[channel_id] = history_text
+        return await future
+
+    def start_flush(self, channel_id):
+        task = asyncio.ensure_future(self.flush(channel_id))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def flush(self, channel_id):
+        batch = self.pending.pop(channel_id, {})
+        history_text = self.history.pop(channel_id, "")
+        if not batch: return
+
+        updated = set()
+        try:
+            if len(batch) == 1:
+                entry = next(iter(batch.values()))
+                ok = await analyze_emotions(history_text + f"\n{entry['line']}", entry['speaker'])
+                updated = {entry['speaker']['uuid']} if ok else set()
+            else:
+                updated = await analyze_emotions_batch(history_text, batch)
+        except Exception as e:
+            print(f"ERROR in emotion batch flush: {e}")
+        finally:
+            # Always answer the waiters, otherwise their replies hang forever
+            for uuid, entry in batch.items():
+                for future in entry['futures']:
+                    if not future.done():
+                        future.set_result(uuid in updated)
+
+emotion_batcher = EmotionBatcher(EMOTION_BATCH_WINDOW, EMOTION_BATCH_QUIET)
+
 # --- CORE RESPONSE HANDLER ---
 async def handle_bot_logic(message, is_ambient=False):
     # 1. LOAD DATA
@@ -277,7 +527,8 @@ async def handle_bot_logic(message, is_ambient=False):
     # Let's check (msg_count + 1) % 3 == 0
     
     if (msg_count + 1) % 3 == 0:
-        await analyze_emotions(history_text + f"\nUser: {message.clean_content}", speaker)
+        # Batched per channel: users due within the same window share one analysis call
+        await emotion_batcher.submit(str(message.channel.id), history_text, f"{message.author.display_name}: {message.clean_content}", speaker)
         # REFRESH DATA to get new stats
         speaker = memory.get_user_data(message.author.id, message.author.name, message.author.display_name)
 
@@ -497,7 +748,7 @@ async def handle_bot_logic(message, is_ambient=False):
         else:
             messages.append({"role": "user", "content": user_message_content})
 
-        chat_completion = groq_client.chat.completions.create(messages=messages, model=model_to_use)
+        chat_completion = get_groq().chat.completions.create(messages=messages, model=model_to_use)
         reply = chat_completion.choices[0].message.content.strip()
         
         if "[SET_NAME:" in reply:
@@ -521,12 +772,111 @@ async def handle_bot_logic(message, is_ambient=False):
             if not is_ambient:
                 await message.channel.send("System glitch... gimme a sec.")
 
+# --- ADMIN HELPERS ---
+class ProgressReporter:
+    """
+    Progress callback for stats_io running in a worker thread.
+    Edits progress_msg on the event loop, at most every PROGRESS_EDIT_INTERVAL seconds (edits are rate-limited).
+    """
+    def __init__(self, progress_msg, render):
+        self.progress_msg = progress_msg
+        self.render = render
+        self.loop = asyncio.get_running_loop()
+        self.last_edit = 0.0
+        self.pending = []
+
+    def __call__(self, value):
+        now = time.time()
+        if now - self.last_edit < PROGRESS_EDIT_INTERVAL: return
+        self.last_edit = now
+        self.pending.append(asyncio.run_coroutine_threadsafe(self.progress_msg.edit(content=self.render(value)), self.loop))
+
+    async def wait(self):
+        """Lets in-flight edits land so they can't overwrite the final message"""
+        for future in self.pending:
+            try:
+                await asyncio.wrap_future(future)
+            except Exception:
+                pass
+
+async def set_relationship_for_mentions(message, values):
+    """Applies the same relationship change to every mentioned user with one lookup + one update"""
+    target_ids = [str(m.id) for m in message.mentions if m.id != bot.user.id]
+    if not target_ids:
+        await message.channel.send("Please mention a user.")
+        return
+
+    res = get_supabase().table('users').select('id').in_('discord_id', target_ids).execute()
+    if not res.data:
+        await message.channel.send("User not found in memory.")
+        return
+
+    uuids = [row['id'] for row in res.data]
+    get_supabase().table('relationships').update(values).in_('user_uuid', uuids).execute()
+    await message.add_reaction("✅")
+    if len(uuids) < len(target_ids):
+        await message.channel.send(f"Updated {len(uuids)}/{len(target_ids)} users ({len(target_ids) - len(uuids)} not found in memory).")
+
+# --- MAINTENANCE ---
+@tasks.loop(minutes=MAINTENANCE_INTERVAL)
+async def maintenance_loop():
+    """Jealousy decay, role refresh and leaderboard cache - all set-based, in one RPC call"""
+    try:
+        res = await asyncio.to_thread(lambda: get_supabase().rpc('run_maintenance', {"jealousy_decay": JEALOUSY_DECAY, "interval_minutes": MAINTENANCE_INTERVAL}).execute())
+        print(f"DEBUG: Maintenance -> {res.data}")
+    except Exception as e:
+        print(f"ERROR in maintenance: {e}")
+
+# --- MEMORY REPORTING ---
+def get_rss_mb():
+    """Current resident memory in MB (peak RSS where /proc isn't available)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return 0.0
+
+def memory_report():
+    return (
+        f"RSS: {get_rss_mb():.1f} MB | Guilds: {len(bot.guilds)} | Cached users: {len(bot.users)} "
+        f"| Cached messages: {len(bot.cached_messages)} | Low memory mode: {'ON' if LOW_MEMORY else 'OFF'}"
+    )
+
+@tasks.loop(minutes=MEMORY_REPORT_INTERVAL)
+async def memory_report_loop():
+    if memory_report_loop.current_loop == 0: return # on_ready already logged the startup numbers
+    print(f"MEMORY: {memory_report()}")
+
 # --- EVENT LOOP ---
 @bot.event
 async def on_ready():
+    global STARTUP_REPORTED
     print(f'Logged in as {bot.user} (ID: {bot.user.id})')
     print('------')
 
+    # on_ready fires again after reconnects; only the first one is the cold start
+    if not STARTUP_REPORTED:
+        STARTUP_REPORTED = True
+        print(f"STARTUP: Ready in {time.perf_counter() - BOOT_STARTED:.1f}s | {memory_report()}")
+        # Build the clients off the event loop so the heavy SDK imports don't stall the gateway
+        await asyncio.to_thread(get_supabase)
+        await asyncio.to_thread(get_groq)
+
+    if not memory_report_loop.is_running():
+        memory_report_loop.start()
+
+    # When sharded only shard 0 schedules it. Other processes may schedule it too:
+    # run_maintenance() skips if another run happened within the interval (maintenance_state.last_run)
+    if MAINTENANCE_ACTIVE and bot.shard_id in (None, 0) and not maintenance_loop.is_running():
+        maintenance_loop.start()
+
 @bot.event
 async def on_message(message):
     if message.author == bot.user: return
@@ -574,88 +924,128 @@ Insults: `{rel['insults_count']}` | Compliments: `{rel['compliments_count']}`
         return
 
     # 0.2 DEBUG COMMANDS (Admin/Owner Only - Simplified check for now)
-    # Usage: !set_affinity @User 50
+    # Usage: !set_affinity @User [@User2 ...] 50
     if message.content.startswith("!set_affinity"):
         if not message.author.guild_permissions.administrator: 
              return
         try:
             parts = message.content.split()
             if len(parts) < 3:
-                await message.channel.send("Usage: !set_affinity @User <score>")
+                await message.channel.send("Usage: !set_affinity @User [@User2 ...] <score>")
                 return
             
-            if not message.mentions:
-                await message.channel.send("Please mention a user.")
-                return
-
-            target_id = message.mentions[0].id
             new_score = int(parts[-1]) # Grab last part as score
-            
-            # Update DB
-            res = supabase.table('users').select('id').eq('discord_id', str(target_id)).execute()
-            if res.data:
-                uuid = res.data[0]['id']
-                supabase.table('relationships').update({"affinity_score": new_score}).eq('user_uuid', uuid).execute()
-                await message.add_reaction("✅")
-            else:
-                await message.channel.send("User not found in memory.")
+            await set_relationship_for_mentions(message, {"affinity_score": new_score})
         except Exception as e:
             await message.channel.send(f"Error: {e}")
         return
 
-    # Usage: !set_trust @User 50
+    # Usage: !set_trust @User [@User2 ...] 50
     if message.content.startswith("!set_trust"):
         if not message.author.guild_permissions.administrator:
              return
         try:
             parts = message.content.split()
             if len(parts) < 3:
-                await message.channel.send("Usage: !set_trust @User <score>")
+                await message.channel.send("Usage: !set_trust @User [@User2 ...] <score>")
                 return
             
-            if not message.mentions:
-                await message.channel.send("Please mention a user.")
-                return
-
-            target_id = message.mentions[0].id
             new_score = int(parts[-1])
-            
-            res = supabase.table('users').select('id').eq('discord_id', str(target_id)).execute()
-            if res.data:
-                uuid = res.data[0]['id']
-                supabase.table('relationships').update({"trust_score": new_score}).eq('user_uuid', uuid).execute()
-                await message.add_reaction("✅")
+            await set_relationship_for_mentions(message, {"trust_score": new_score})
         except Exception as e:
             await message.channel.send(f"Error: {e}")
         return
 
-    # Usage: !set_role @User enemy
+    # Usage: !set_role @User [@User2 ...] enemy   (or `auto` to let affinity decide again)
     if message.content.startswith("!set_role"):
         if not message.author.guild_permissions.administrator:
              return
         try:
             parts = message.content.split()
             if len(parts) < 3:
-                await message.channel.send("Usage: !set_role @User <role>")
-                return
-            
-            if not message.mentions:
-                await message.channel.send("Please mention a user.")
+                await message.channel.send("Usage: !set_role @User [@User2 ...] <role|auto>")
                 return
             
             role = parts[-1].lower()
-            target_id = message.mentions[0].id
-            
-            valid_roles = ['neutral', 'friend', 'enemy', 'annoying', 'baby', 'favorite']
-            if role not in valid_roles:
-                await message.channel.send(f"Invalid role. Choices: {', '.join(valid_roles)}")
+            if role == "auto":
+                # Unpin: the next maintenance run derives the role from affinity again
+                await set_relationship_for_mentions(message, {"role_pinned": False})
                 return
 
-            res = supabase.table('users').select('id').eq('discord_id', str(target_id)).execute()
-            if res.data:
-                uuid = res.data[0]['id']
-                supabase.table('relationships').update({"role": role}).eq('user_uuid', uuid).execute()
-                await message.add_reaction("✅")
+            if role not in stats_io.VALID_ROLES:
+                await message.channel.send(f"Invalid role. Choices: {', '.join(stats_io.VALID_ROLES)}, auto")
+                return
+
+            # Admin-set roles are pinned so maintenance doesn't overwrite them
+            await set_relationship_for_mentions(message, {"role": role, "role_pinned": True})
+        except Exception as e:
+            await message.channel.send(f"Error: {e}")
+        return
+
+    # 0.3 BULK STATS (Admin) - same format as `python stats_io.py export/import`
+    # Usage: !export_stats [csv|jsonl]
+    if message.content.startswith("!export_stats"):
+        if not message.author.guild_permissions.administrator:
+             return
+        try:
+            parts = message.content.split()
+            fmt = parts[1].lower() if len(parts) > 1 and parts[1].lower() in ["csv", "jsonl"] else "csv"
+            started = time.time()
+            progress_msg = await message.channel.send(f"⏳ Exporting users as {fmt}...")
+            reporter = ProgressReporter(progress_msg, lambda n: f"⏳ Exporting users as {fmt}... {n} so far")
+
+            # Streams to a temp file on disk (not memory); runs in a thread so paging doesn't block the gateway
+            out = io.TextIOWrapper(tempfile.TemporaryFile(), encoding="utf-8", newline="")
+            count = await asyncio.to_thread(stats_io.export_stats, get_supabase(), out, fmt, stats_io.PAGE_SIZE, reporter)
+            out.flush()
+            raw = out.detach()
+            size = raw.tell()
+            await reporter.wait()
+
+            limit = message.guild.filesize_limit if message.guild else 10 * 1024 * 1024
+            if size > limit:
+                raw.close()
+                await progress_msg.edit(content=f"⚠️ Export is {size / (1024 * 1024):.1f} MB ({count} users), over this server's {limit // (1024 * 1024)} MB upload limit. Run `python stats_io.py export --format {fmt} --out ruby_stats.{fmt}` instead.")
+                return
+
+            raw.seek(0)
+            file = discord.File(raw, filename=f"ruby_stats.{fmt}")
+            await progress_msg.edit(content=f"📦 Exported **{count}** users in {time.time() - started:.1f}s", attachments=[file])
+        except Exception as e:
+            await message.channel.send(f"Error: {e}")
+        return
+
+    # Usage: !import_stats [add] [dry]  (with a .csv/.jsonl file attached)
+    if message.content.startswith("!import_stats"):
+        if not message.author.guild_permissions.administrator:
+             return
+        try:
+            if not message.attachments:
+                await message.channel.send("Usage: !import_stats [add] [dry] + attach a .csv or .jsonl file")
+                return
+            
+            options = message.content.lower().split()[1:]
+            additive = "add" in options
+            dry_run = "dry" in options
+            attachment = message.attachments[0]
+            fmt = "jsonl" if attachment.filename.lower().endswith((".jsonl", ".json")) else "csv"
+            text = (await attachment.read()).decode("utf-8-sig")
+
+            progress_msg = await message.channel.send(f"⏳ {'Checking' if dry_run else 'Importing'} `{attachment.filename}`...")
+            started = time.time()
+            reporter = ProgressReporter(progress_msg, lambda s: f"⏳ {'Checking' if dry_run else 'Importing'} `{attachment.filename}`... {s['rows']} rows ({s['updated']} updated, {s['created']} new)")
+            summary = await asyncio.to_thread(
+                stats_io.import_stats, get_supabase(), stats_io.read_rows(io.StringIO(text), fmt), additive, dry_run,
+                stats_io.IMPORT_BATCH_SIZE, reporter
+            )
+            await reporter.wait()
+
+            report = f"{'🧪 DRY RUN: would import' if dry_run else '✅ Imported'} **{summary['rows']}** rows ({summary['updated']} updated, {summary['created']} new, {summary['duplicates']} merged duplicates, {len(summary['errors'])} skipped) in {time.time() - started:.1f}s"
+            if summary['errors']:
+                report += "\n" + "\n".join(f"- {err}" for err in summary['errors'][:10])
+                if len(summary['errors']) > 10:
+                    report += f"\n...and {len(summary['errors']) - 10} more"
+            await progress_msg.edit(content=report)
         except Exception as e:
             await message.channel.send(f"Error: {e}")
         return
@@ -691,4 +1081,6 @@ Insults: `{rel['insults_count']}` | Compliments: `{rel['compliments_count']}`
         print(f"DEBUG: Triggering Ambient Presence in {message.channel.name} by {message.author.display_name}")
         await handle_bot_logic(message, is_ambient=True)
 
-bot.run(DISCORD_TOKEN)
+if __name__ == "__main__":
+    validate_config()
+    bot.run(DISCORD_TOKEN)
@@ -18,6 +18,7 @@ create table public.relationships (
   
   -- The Label
   role text default 'neutral',   -- 'baby', 'favorite', 'friend', 'neutral', 'annoying', 'enemy'
+  role_pinned boolean default false, -- Set by admins; maintenance won't re-derive it from affinity
   
   -- Counters
   insults_count int default 0,
@@ -40,3 +41,185 @@ create table public.convos (
   content text not null,
   created_at timestamp with time zone default timezone('utc'::text, now())
 );
+
+-- 5. BULK IMPORT (used by stats_io.py and !import_stats)
+-- payload: [{"discord_id": "...", "username": "...", "affinity_score": 10, "role": "friend", ...}, ...]
+-- Missing keys / nulls leave the stored value alone. With additive = true numeric stats are added instead of set.
+-- One call = one transaction, so a batch is applied completely or not at all.
+create or replace function public.import_stats(payload jsonb, additive boolean default false, dry_run boolean default false)
+returns jsonb
+language plpgsql
+as $$
+declare
+  created_count int := 0;
+  updated_count int := 0;
+begin
+  if dry_run then
+    select count(u.id), count(*) - count(u.id)
+      into updated_count, created_count
+      from jsonb_to_recordset(payload) as r(discord_id text)
+      left join public.users u on u.discord_id = r.discord_id;
+    return jsonb_build_object('updated', updated_count, 'created', created_count);
+  end if;
+
+  -- New people get the same default rows get_user_data() would create
+  with new_users as (
+    insert into public.users (discord_id, username)
+    select r.discord_id, r.username
+      from jsonb_to_recordset(payload) as r(discord_id text, username text)
+    on conflict (discord_id) do nothing
+    returning id
+  ), new_rels as (
+    insert into public.relationships (user_uuid, role)
+    select id, 'neutral' from new_users
+    returning user_uuid
+  )
+  insert into public.personalities (user_uuid)
+  select user_uuid from new_rels;
+  get diagnostics created_count = row_count;
+
+  -- Renames for people we already know
+  update public.users u set username = r.username
+  from jsonb_to_recordset(payload) as r(discord_id text, username text)
+  where u.discord_id = r.discord_id
+    and r.username is not null
+    and u.username is distinct from r.username;
+
+  update public.relationships rel set
+    affinity_score    = greatest(-100, least(100, case when additive then rel.affinity_score + coalesce(r.affinity_score, 0) else coalesce(r.affinity_score, rel.affinity_score) end)),
+    trust_score       = greatest(0, least(100, case when additive then rel.trust_score + coalesce(r.trust_score, 0) else coalesce(r.trust_score, rel.trust_score) end)),
+    jealousy_meter    = greatest(0, least(100, case when additive then rel.jealousy_meter + coalesce(r.jealousy_meter, 0) else coalesce(r.jealousy_meter, rel.jealousy_meter) end)),
+    insults_count     = greatest(0, case when additive then rel.insults_count + coalesce(r.insults_count, 0) else coalesce(r.insults_count, rel.insults_count) end),
+    compliments_count = greatest(0, case when additive then rel.compliments_count + coalesce(r.compliments_count, 0) else coalesce(r.compliments_count, rel.compliments_count) end),
+    role              = coalesce(r.role, rel.role),
+    -- An imported role counts as admin-set unless the file says otherwise
+    role_pinned       = coalesce(r.role_pinned, coalesce(rel.role_pinned, false) or r.role is not null)
+  from jsonb_to_recordset(payload) as r(discord_id text, affinity_score int, trust_score int, jealousy_meter int, insults_count int, compliments_count int, role text, role_pinned boolean)
+  join public.users u on u.discord_id = r.discord_id
+  where rel.user_uuid = u.id;
+  get diagnostics updated_count = row_count;
+
+  update public.personalities p set
+    vibe_summary        = coalesce(r.vibe_summary, p.vibe_summary),
+    nickname_preference = coalesce(r.nickname_preference, p.nickname_preference)
+  from jsonb_to_recordset(payload) as r(discord_id text, vibe_summary text, nickname_preference text)
+  join public.users u on u.discord_id = r.discord_id
+  where p.user_uuid = u.id
+    and (r.vibe_summary is not null or r.nickname_preference is not null);
+
+  return jsonb_build_object('updated', updated_count - created_count, 'created', created_count);
+end;
+$$;
+
+-- 6. MAINTENANCE (run by the bot every MAINTENANCE_INTERVAL minutes, see run_maintenance())
+-- Existing databases: add the pin flag. Roles used to be admin-only, so anything non-neutral was set by hand.
+-- The backfill only runs in the same call that adds the column, so re-running this section is safe
+-- (otherwise it would pin every role maintenance has derived since).
+do $$
+begin
+  if not exists (
+    select 1 from information_schema.columns
+     where table_schema = 'public' and table_name = 'relationships' and column_name = 'role_pinned'
+  ) then
+    alter table public.relationships add column role_pinned boolean default false;
+    update public.relationships set role_pinned = true where role <> 'neutral';
+  end if;
+end;
+$$;
+
+-- Leaderboard answers for "who is your favorite?" questions, one row per stat
+create table if not exists public.leaderboard_cache (
+  stat text primary key,
+  username text,
+  refreshed_at timestamp with time zone default timezone('utc'::text, now())
+);
+
+-- When maintenance last did its work, so extra processes / restarts don't run it again early
+create table if not exists public.maintenance_state (
+  job text primary key,
+  last_run timestamp with time zone not null
+);
+
+-- Affinity -> role thresholds. 'baby' is never earned automatically.
+create or replace function public.derive_role(affinity int)
+returns text
+language sql
+immutable
+as $$
+  select case
+    when affinity >= 60 then 'favorite'
+    when affinity >= 25 then 'friend'
+    when affinity > -25 then 'neutral'
+    when affinity > -60 then 'annoying'
+    else 'enemy'
+  end;
+$$;
+
+-- Each job is a single set-based statement; the whole run is one transaction.
+-- The advisory lock makes overlapping calls return immediately; last_run makes calls from other
+-- processes (or a restarted bot) within the same interval skip, so jealousy decays once per interval.
+create or replace function public.run_maintenance(jealousy_decay int default 5, interval_minutes int default 10)
+returns jsonb
+language plpgsql
+as $$
+declare
+  decayed int := 0;
+  rerolled int := 0;
+begin
+  if not pg_try_advisory_xact_lock(hashtext('ruby_maintenance')) then
+    return jsonb_build_object('skipped', true);
+  end if;
+
+  -- 90% of the interval leaves room for loop timing drift
+  if exists (
+    select 1 from public.maintenance_state
+     where job = 'maintenance'
+       and last_run > now() - make_interval(secs => interval_minutes * 60 * 0.9)
+  ) then
+    return jsonb_build_object('skipped', true);
+  end if;
+
+  insert into public.maintenance_state (job, last_run)
+  values ('maintenance', now())
+  on conflict (job) do update set last_run = excluded.last_run;
+
+  -- 1. Jealousy is temporary: drift back toward 0
+  update public.relationships
+     set jealousy_meter = greatest(0, jealousy_meter - jealousy_decay)
+   where jealousy_meter > 0;
+  get diagnostics decayed = row_count;
+
+  -- 2. Re-derive roles from affinity, leaving admin-pinned ones alone
+  update public.relationships
+     set role = public.derive_role(coalesce(affinity_score, 0))
+   where not coalesce(role_pinned, false)
+     and role is distinct from public.derive_role(coalesce(affinity_score, 0));
+  get diagnostics rerolled = row_count;
+
+  -- 3. Leaderboard cache
+  with ranked as (
+    select r.*, u.username
+      from public.relationships r
+      join public.users u on u.id = r.user_uuid
+  )
+  insert into public.leaderboard_cache (stat, username, refreshed_at)
+  select s.stat, s.username, timezone('utc'::text, now())
+    from (
+      select 'favorite' as stat, (select username from ranked where role in ('baby', 'favorite') order by role = 'baby' desc limit 1) as username
+      union all select 'high_affinity', (select username from ranked order by affinity_score desc nulls last limit 1)
+      union all select 'low_affinity', (select username from ranked order by affinity_score asc nulls last limit 1)
+      union all select 'high_trust', (select username from ranked order by trust_score desc nulls last limit 1)
+      union all select 'low_trust', (select username from ranked order by trust_score asc nulls last limit 1)
+      union all select 'high_jealousy', (select username from ranked order by jealousy_meter desc nulls last limit 1)
+      union all select 'never_jealous', (select username from ranked where jealousy_meter = 0 order by random() limit 1)
+      union all select 'most_insults', (select username from ranked order by insults_count desc nulls last limit 1)
+      union all select 'never_insulted', (select username from ranked where insults_count = 0 order by random() limit 1)
+      union all select 'most_compliments', (select username from ranked order by compliments_count desc nulls last limit 1)
+      union all select 'never_complimented', (select username from ranked where compliments_count = 0 order by random() limit 1)
+    ) s
+  on conflict (stat) do update
+    set username = excluded.username, refreshed_at = excluded.refreshed_at;
+
+  return jsonb_build_object('skipped', false, 'jealousy_decayed', decayed, 'roles_updated', rerolled);
+end;
+$$;
@@ -0,0 +1,223 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+
+VALID_ROLES = ['neutral', 'friend', 'enemy', 'annoying', 'baby', 'favorite']
+
+# Flat row layout shared by CSV and JSONL files
+EXPORT_FIELDS = [
+    "discord_id", "username", "role", "role_pinned",
+    "affinity_score", "trust_score", "jealousy_meter", "insults_count", "compliments_count",
+    "vibe_summary", "nickname_preference"
+]
+INT_FIELDS = ["affinity_score", "trust_score", "jealousy_meter", "insults_count", "compliments_count"]
+TEXT_FIELDS = ["username", "vibe_summary", "nickname_preference"]
+
+PAGE_SIZE = 1000
+IMPORT_BATCH_SIZE = 500
+
+# --- EXPORT ---
+def iter_stats(supabase, page_size=PAGE_SIZE):
+    """Streams users + relationship + personality as flat rows, one page (= one query) at a time"""
+    last_id = None
+    while True:
+        # Keyset pagination on the primary key, relationships/personalities embedded through their FK
+        query = supabase.table('users').select(
+            'id, discord_id, username, '
+            'relationships(role, role_pinned, affinity_score, trust_score, jealousy_meter, insults_count, compliments_count), '
+            'personalities(vibe_summary, nickname_preference)'
+        ).order('id').limit(page_size)
+        if last_id:
+            query = query.gt('id', last_id)
+        users = query.execute().data
+        if not users: return
+
+        for u in users:
+            rel = u['relationships'][0] if u.get('relationships') else {}
+            pers = u['personalities'][0] if u.get('personalities') else {}
+            row = {"discord_id": u['discord_id'], "username": u['username']}
+            row.update({k: rel.get(k) for k in ["role", "role_pinned"] + INT_FIELDS})
+            row.update({k: pers.get(k) for k in ["vibe_summary", "nickname_preference"]})
+            yield row
+
+        if len(users) < page_size: return
+        last_id = users[-1]['id']
+
+def export_stats(supabase, fp, fmt="csv", page_size=PAGE_SIZE, progress=None):
+    """Writes every user to fp as CSV or JSONL. Returns the number of rows written."""
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(fp, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+
+    count = 0
+    for row in iter_stats(supabase, page_size):
+        if writer:
+            writer.writerow(row)
+        else:
+            fp.write(json.dumps(row, ensure_ascii=False) + "\n")
+        count += 1
+        if progress and count % page_size == 0:
+            progress(count)
+    return count
+
+# --- IMPORT ---
+def read_rows(fp, fmt="csv"):
+    """
+    Yields (line number in the file, row) from a CSV or JSONL file object.
+    JSONL rows are yielded as unparsed text; import_stats parses them so one bad line is just one error.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(fp)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_no, line in enumerate(fp, start=1):
+        line = line.strip()
+        if line:
+            yield line_no, line
+
+def clean_row(row):
+    """Validates one import row. Empty cells are dropped so they don't overwrite stored values."""
+    discord_id = str(row.get('discord_id') or "").strip()
+    if not discord_id.isdigit():
+        raise ValueError(f"invalid discord_id {row.get('discord_id')!r}")
+
+    clean = {"discord_id": discord_id}
+    for field in INT_FIELDS:
+        value = row.get(field)
+        if value is None or value == "": continue
+        try:
+            clean[field] = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{discord_id}: {field} must be an integer, got {value!r}")
+
+    role = row.get('role')
+    if role not in (None, ""):
+        role = str(role).lower().strip()
+        if role not in VALID_ROLES:
+            raise ValueError(f"{discord_id}: invalid role {role!r}")
+        clean['role'] = role
+
+    pinned = row.get('role_pinned')
+    if pinned not in (None, ""):
+        if str(pinned).lower() not in ("true", "false", "1", "0"):
+            raise ValueError(f"{discord_id}: role_pinned must be true/false, got {pinned!r}")
+        clean['role_pinned'] = str(pinned).lower() in ("true", "1")
+
+    for field in TEXT_FIELDS:
+        value = row.get(field)
+        if value not in (None, ""):
+            clean[field] = str(value)
+    return clean
+
+def import_stats(supabase, rows, additive=False, dry_run=False, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """
+    Upserts stat rows in batches, one transaction (RPC call) per batch.
+    rows: (line_no, row) pairs as yielded by read_rows(). Invalid rows are reported in errors, not raised.
+    additive=True adds the numbers to the current stats instead of replacing them.
+    Returns a summary dict: rows (distinct users sent), duplicates (rows merged into an earlier one),
+    updated, created, errors (list of messages).
+    """
+    summary = {"rows": 0, "duplicates": 0, "updated": 0, "created": 0, "errors": []}
+    batch = {}
+    seen = set()  # discord_ids of the whole run, so rows/duplicates don't depend on batch_size
+
+    def flush():
+        if not batch: return
+        res = supabase.rpc('import_stats', {
+            "payload": list(batch.values()),
+            "additive": additive,
+            "dry_run": dry_run
+        }).execute()
+        summary['updated'] += res.data.get('updated', 0)
+        summary['created'] += res.data.get('created', 0)
+        batch.clear()
+        if progress: progress(summary)
+
+    for line_no, row in rows:
+        try:
+            if isinstance(row, str):
+                row = json.loads(row)
+            if not isinstance(row, dict):
+                raise ValueError(f"expected a JSON object, got {type(row).__name__}")
+            clean = clean_row(row)
+        except ValueError as e:  # json.JSONDecodeError is a ValueError too
+            summary['errors'].append(f"line {line_no}: {e}")
+            continue
+        if clean['discord_id'] in seen:
+            summary['duplicates'] += 1
+        else:
+            seen.add(clean['discord_id'])
+            summary['rows'] += 1
+
+        existing = batch.get(clean['discord_id'])
+        if existing is None:
+            # Also the case for a duplicate whose first row went out in an earlier batch:
+            # the database then adds (additive) or overwrites (later row wins) like the merge below
+            batch[clean['discord_id']] = clean
+        else:
+            # Same user twice in a batch: deltas add up in additive mode, otherwise the later row wins
+            if additive:
+                for field in INT_FIELDS:
+                    if field in existing and field in clean:
+                        clean[field] += existing[field]
+            existing.update(clean)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return summary
+
+# --- CLI ---
+def main(argv=None):
+    from supabase import create_client
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Bulk export/import of Ruby's user stats")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export", help="Stream all users + stats to CSV/JSONL")
+    exp.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    exp.add_argument("--out", default="-", help="Output file (default: stdout)")
+    exp.add_argument("--page-size", type=int, default=PAGE_SIZE)
+
+    imp = sub.add_parser("import", help="Upsert stats from a CSV/JSONL file")
+    imp.add_argument("file")
+    imp.add_argument("--format", choices=["csv", "jsonl"], help="Default: from file extension")
+    imp.add_argument("--add", action="store_true", help="Add numbers to current stats instead of setting them")
+    imp.add_argument("--dry-run", action="store_true", help="Validate and count, don't write anything")
+    imp.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    started = time.time()
+
+    if args.command == "export":
+        report = lambda n: print(f"... exported {n} users", file=sys.stderr)
+        if args.out == "-":
+            count = export_stats(supabase, sys.stdout, args.format, args.page_size, report)
+        else:
+            with open(args.out, "w", newline="", encoding="utf-8") as fp:
+                count = export_stats(supabase, fp, args.format, args.page_size, report)
+        print(f"Exported {count} users in {time.time() - started:.1f}s", file=sys.stderr)
+        return 0
+
+    fmt = args.format or ("jsonl" if args.file.endswith((".jsonl", ".json")) else "csv")
+    report = lambda s: print(f"... {s['rows']} rows ({s['updated']} updated, {s['created']} new)", file=sys.stderr)
+    # utf-8-sig: spreadsheet apps like to start CSVs with a BOM
+    with open(args.file, newline="", encoding="utf-8-sig") as fp:
+        summary = import_stats(supabase, read_rows(fp, fmt), args.add, args.dry_run, args.batch_size, report)
+
+    for err in summary['errors']:
+        print(f"SKIPPED {err}", file=sys.stderr)
+    prefix = "DRY RUN: would import" if args.dry_run else "Imported"
+    print(f"{prefix} {summary['rows']} rows ({summary['updated']} updated, {summary['created']} new, {summary['duplicates']} merged duplicates, {len(summary['errors'])} skipped) in {time.time() - started:.1f}s")
+    return 1 if summary['errors'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
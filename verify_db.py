@@ -10,9 +10,10 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 def verify():
     print("--- Verifying Users ---")
-    users = supabase.table('users').select('*').execute()
+    # Count server-side and only print a sample; use `python stats_io.py export` for the full list
+    users = supabase.table('users').select('username, discord_id', count='exact').order('created_at', desc=True).limit(10).execute()
     if users.data:
-        print(f"Found {len(users.data)} user(s):")
+        print(f"Found {users.count} user(s) (showing newest {len(users.data)}):")
         for u in users.data:
             print(f"- {u['username']} (ID: {u['discord_id']})")
     else: